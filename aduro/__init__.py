@@ -2,7 +2,8 @@ __version__ = '0.0.1a0'
 
 
 from .events import EventParseError, Event, KindleEvent, AddEvent,\
-        SetReadingEvent, SetFinishedEvent, UpdateEvent, ReadEvent
-from .manager import KindleProgressMgr
+        SetReadingEvent, SetFinishedEvent, UpdateEvent, ReadEvent, \
+        parse_event, match_event
+from .manager import KindleProgressMgr, LibraryCache
 from .snapshot import ReadingStatus, BookSnapshot, KindleLibrarySnapshot
 from .store import EventStore
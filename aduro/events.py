@@ -1,5 +1,6 @@
 """Defines Kindle Events
 """
+import functools
 import re
 
 import dateutil.parser
@@ -17,37 +18,48 @@ class EventParseError(Exception):
 class Event(object):
     """A base event.
     """
-    pass
+    __slots__ = ()
 
 
+@functools.total_ordering
 class KindleEvent(Event):
     """A base kindle event.
 
-    Establishes sortability of Events based on the `weight` property
-    """
-    _WEIGHT = None
-    asin = None
+    Establishes sortability of Events based on the `weight` attribute, which
+    defines the sorting order of events
 
-    @property
-    def weight(self):
-        """Define the sorting order of events
-        """
-        return self._WEIGHT
+    Events are not modified once constructed so their string form is computed
+    at most once.
+    """
+    __slots__ = ('asin', '_str')
+    weight = None
 
     @staticmethod
     def from_str(string):
         """Generate a `KindleEvent`-type object from a string
         """
+        return parse_event(string)
+
+    def _serialize(self):
+        """Generate the string form of the event
+        """
         raise NotImplementedError
 
+    def __str__(self):
+        try:
+            return self._str
+        except AttributeError:
+            self._str = self._serialize()
+            return self._str
+
     def __eq__(self, other):
-        return self.weight == other.weight and self.asin == other.asin
+        return (self.weight, self.asin) == (other.weight, other.asin)
 
     def __lt__(self, other):
-        return self.weight < other.weight and self.asin < other.asin
+        return (self.weight, self.asin) < (other.weight, other.asin)
 
-    def __gt__(self, other):
-        return self.weight > other.weight and self.asin > other.asin
+    def __hash__(self):
+        return hash((self.weight, self.asin))
 
     def __ne__(self, other):
         return not self == other
@@ -56,37 +68,35 @@ class KindleEvent(Event):
 class AddEvent(KindleEvent):
     """Represent the addition of a book to the Kindle Library
     """
-    _WEIGHT = 0
+    __slots__ = ()
+    weight = 0
 
     def __init__(self, asin):
-        super(AddEvent, self).__init__()
         self.asin = asin
 
-    def __str__(self):
+    def _serialize(self):
         return 'ADD %s' % (self.asin,)
 
     @staticmethod
     def from_str(string):
         """Generate a `AddEvent` object from a string
         """
-        match = re.match(r'^ADD (\w+)$', string)
-        if match:
-            return AddEvent(match.group(1))
-        else:
-            raise EventParseError
+        return _parse_as(string, AddEvent)
 
 
 class SetReadingEvent(KindleEvent):
     """Represents the user's desire to record progress of a book
     """
-    _WEIGHT = 1
+    __slots__ = ('initial_progress',)
+    weight = 1
 
     def __init__(self, asin, initial_progress):
-        super(SetReadingEvent, self).__init__()
         self.asin = asin
         self.initial_progress = initial_progress
+        if initial_progress < 0:
+            raise ValueError('Initial progress field must be non-negative')
 
-    def __str__(self):
+    def _serialize(self):
         return 'START READING %s FROM %s %d' % (self.asin, POSITION_MEASURE,
                 self.initial_progress)
 
@@ -94,26 +104,22 @@ class SetReadingEvent(KindleEvent):
     def from_str(string):
         """Generate a `SetReadingEvent` object from a string
         """
-        match = re.match(r'^START READING (\w+) FROM \w+ (\d+)$', string)
-        if match:
-            return SetReadingEvent(match.group(1), int(match.group(2)))
-        else:
-            raise EventParseError
+        return _parse_as(string, SetReadingEvent)
 
 
 class ReadEvent(KindleEvent):
     """Represents the advance of a user's progress in a book
     """
-    _WEIGHT = 2
+    __slots__ = ('progress',)
+    weight = 2
 
     def __init__(self, asin, progress):
-        super(ReadEvent, self).__init__()
         self.asin = asin
         self.progress = progress
         if progress <= 0:
             raise ValueError('Progress field must be positive')
 
-    def __str__(self):
+    def _serialize(self):
         return 'READ %s FOR %d %sS' % (self.asin, self.progress,
                 POSITION_MEASURE)
 
@@ -121,41 +127,37 @@ class ReadEvent(KindleEvent):
     def from_str(string):
         """Generate a `ReadEvent` object from a string
         """
-        match = re.match(r'^READ (\w+) FOR (\d+) \w+S$', string)
-        if match:
-            return ReadEvent(match.group(1), int(match.group(2)))
-        else:
-            raise EventParseError
+        return _parse_as(string, ReadEvent)
 
 
 class SetFinishedEvent(KindleEvent):
     """Represents a user's completion of a book
     """
-    _WEIGHT = 3
+    __slots__ = ()
+    weight = 3
 
     def __init__(self, asin):
-        super(SetFinishedEvent, self).__init__()
         self.asin = asin
 
-    def __str__(self):
+    def _serialize(self):
         return 'FINISH READING %s' % (self.asin)
 
     @staticmethod
     def from_str(string):
         """Generate a `SetFinishedEvent` object from a string
         """
-        match = re.match(r'^FINISH READING (\w+)$', string)
-        if match:
-            return SetFinishedEvent(match.group(1))
-        else:
-            raise EventParseError
+        return _parse_as(string, SetFinishedEvent)
 
 
 class UpdateEvent(Event):
     """Represents a user's update of the Kindle database
     """
+    __slots__ = ('datetime_',)
+    # Sort updates after the `KindleEvent`s they conclude
+    weight = 4
+    asin = None
+
     def __init__(self, a_datetime):
-        super(UpdateEvent, self).__init__()
         self.datetime_ = a_datetime
 
     def __str__(self):
@@ -165,9 +167,69 @@ class UpdateEvent(Event):
     def from_str(string):
         """Generate a `SetFinishedEvent` object from a string
         """
-        match = re.match(r'^UPDATE (.+)$', string)
-        if match:
-            parsed_date = dateutil.parser.parse(match.group(1), ignoretz=True)
+        head, _, date_str = string.partition(' ')
+        if head == 'UPDATE' and date_str:
+            parsed_date = dateutil.parser.parse(date_str, ignoretz=True)
             return UpdateEvent(parsed_date)
         else:
             raise EventParseError
+
+
+# Recognizes any serialized `KindleEvent` in a single match. Each alternative
+# names its fields after its event and ends in an empty group named for the
+# event so that `lastgroup` identifies which one matched.
+_EVENT_RE = re.compile(
+    r'(?:ADD (?P<add_asin>\w+)(?P<add>)'
+    r'|START READING (?P<start_asin>\w+) FROM \w+ (?P<start_progress>\d+)'
+    r'(?P<start>)'
+    r'|READ (?P<read_asin>\w+) FOR (?P<read_progress>\d+) \w+S(?P<read>)'
+    r'|FINISH READING (?P<finish_asin>\w+)(?P<finish>))\Z')
+
+# Maps each alternative of `_EVENT_RE` to a function constructing its event
+# from the match
+_EVENT_BUILDERS = {
+    'add': lambda match: AddEvent(match.group('add_asin')),
+    'start': lambda match: SetReadingEvent(
+        match.group('start_asin'), int(match.group('start_progress'))),
+    'read': lambda match: ReadEvent(
+        match.group('read_asin'), int(match.group('read_progress'))),
+    'finish': lambda match: SetFinishedEvent(match.group('finish_asin')),
+}
+
+
+def match_event(string):
+    """Returns the `KindleEvent`-type object serialized in `string` or None if
+    `string` does not hold one
+    """
+    match = _EVENT_RE.match(string)
+    if match is None:
+        return None
+    try:
+        return _EVENT_BUILDERS[match.lastgroup](match)
+    except ValueError:
+        # Well-formed but invalid, e.g. a read of zero locations
+        return None
+
+
+def _parse_as(string, event_cls):
+    """Generate an `event_cls` object from a string
+
+    Raises:
+        EventParseError: If `string` is not a serialized `event_cls`
+    """
+    event = match_event(string)
+    if type(event) is not event_cls:
+        raise EventParseError
+    return event
+
+
+def parse_event(string):
+    """Generate a `KindleEvent`-type object from a string
+
+    Raises:
+        EventParseError: If `string` is not a serialized `KindleEvent`
+    """
+    event = match_event(string)
+    if event is None:
+        raise EventParseError
+    return event
@@ -0,0 +1,31 @@
+"""Defines helpers for writing files
+"""
+from contextlib import contextmanager
+import os
+import tempfile
+
+
+# Python 2 lacks `os.replace` but there `os.rename` replaces an existing file
+# everywhere except Windows
+_replace = getattr(os, 'replace', os.rename)
+
+
+@contextmanager
+def atomic_write(file_path):
+    """Returns a context manager yielding a binary file whose contents replace
+    the file at `file_path` once the context exits without error
+
+    The contents are written to a uniquely named temporary file in the same
+    directory so readers never observe a partially written file and
+    concurrent writers never share a temporary file.
+    """
+    dir_name, base_name = os.path.split(file_path)
+    fd, tmp_path = tempfile.mkstemp(prefix=base_name + '.', suffix='.tmp',
+                                    dir=dir_name or os.curdir)
+    try:
+        with os.fdopen(fd, 'wb') as file_:
+            yield file_
+        _replace(tmp_path, file_path)
+    except:  #pylint: disable=bare-except
+        os.unlink(tmp_path)
+        raise
@@ -2,10 +2,63 @@
 progress tracking
 """
 from .events import UpdateEvent
+from .fileutil import atomic_write
 from .snapshot import KindleLibrarySnapshot
-from lector.reader import KindleCloudReaderAPI, KindleAPIError
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from operator import attrgetter
+from threading import Thread
+import logging
+import pickle
+
+
+# Sorts events such that, when applied in order, each event represents a
+# logical change in state. Comparing key tuples keeps the sort in C.
+_event_order = attrgetter('weight', 'asin')
+
+_log = logging.getLogger(__name__)
+
+
+class LibraryCache(object):
+    """A file-backed cache of the Kindle library state last retrieved for an
+    account
+
+    Args:
+        file_path: The path of the file in which to cache the library state
+        max_age: A `timedelta` after which cached state is considered stale
+    """
+    def __init__(self, file_path, max_age=timedelta(minutes=15)):
+        self._path = file_path
+        self.max_age = max_age
+
+    def load(self, uname):
+        """Returns the state cached for the account `uname` as a tuple of
+        `(books, progress, fetched)` where `fetched` is the `datetime` at which
+        it was retrieved.
+
+        Returns:
+            If no state is cached for `uname`, None
+            Else, the tuple of cached state
+        """
+        try:
+            with open(self._path, 'rb') as file_:
+                cached_uname, books, progress, fetched = pickle.load(file_)
+        except Exception:  #pylint: disable=broad-except
+            # A missing, truncated, or outdated cache is just a cache miss
+            return None
+        if cached_uname != uname:
+            return None
+        return books, progress, fetched
+
+    def save(self, uname, books, progress):
+        """Replaces the cached state with the `books` and `progress` retrieved
+        for the account `uname`
+        """
+        # Replace the cache atomically so a concurrent `load` never observes
+        # a partially written cache
+        with atomic_write(self._path) as file_:
+            pickle.dump((uname, books, progress, datetime.now()), file_,
+                        pickle.HIGHEST_PROTOCOL)
 
 
 class KindleProgressMgr(object):
@@ -16,59 +69,158 @@ class KindleProgressMgr(object):
         store: An `EventStore` instance containing the past events
         kindle_uname: The email associated with the Kindle account
         kindle_pword: The password associated with the Kindle account
+        cache: An optional `LibraryCache` instance used to avoid retrieving
+            the Kindle Library on every call to `detect_events`
+        checkpoint_path: An optional path at which to checkpoint the library
+            snapshot on commit so that only subsequent events need be
+            replayed on construction
     """
-    def __init__(self, store, kindle_uname, kindle_pword):
+    def __init__(self, store, kindle_uname, kindle_pword, cache=None,
+                 checkpoint_path=None):
         self.store = store
-        self._snapshot = KindleLibrarySnapshot(store.get_events())
+        self._checkpoint_path = checkpoint_path
+        # The store offset up to which events have been applied to the
+        # snapshot, whoever recorded them
+        self._snapshot, self._applied_offset = self._load_snapshot()
         self._event_buf = []
         self.uname = kindle_uname
         self.pword = kindle_pword
         self.books = None
         self.progress = None
+        # When `books` and `progress` come from the cache, the `datetime` at
+        # which they were retrieved
+        self.cached_at = None
+        self._cache = cache
+        self._refresh = None
+
+    def _load_snapshot(self):
+        """Returns a tuple of the `KindleLibrarySnapshot` of the events in the
+        store and the store offset up to which they were applied
+        """
+        if self._checkpoint_path is not None:
+            try:
+                return KindleLibrarySnapshot.load(self._checkpoint_path,
+                                                  self.store)
+            except Exception:  #pylint: disable=broad-except
+                # A missing or unusable checkpoint just requires a full replay
+                pass
+        snapshot = KindleLibrarySnapshot()
+        return snapshot, snapshot.apply_store_events(self.store)
 
     @property
     def uncommited_events(self):
         """A logically sorted list of `Events` that are have been registered
         to be committed to the current object's state but remain uncommitted.
         """
-        return list(sorted(self._event_buf))
-
-    def detect_events(self, max_attempts=3):
-        """Returns a list of `Event`s detected from differences in state
-        between the current snapshot and the Kindle Library.
+        return sorted(self._event_buf, key=_event_order)
 
-        `books` and `progress` attributes will be set with the latest API
-        results upon successful completion of the function.
+    def _fetch_library(self, max_attempts):
+        """Retrieves the current state of the Kindle Library from the KindleAPI
 
         Returns:
             If failed to retrieve progress, None
-            Else, the list of `Event`s
+            Else, a tuple of `(books, progress)`
         """
-        # Attempt to retrieve current state from KindleAPI
-        for _ in xrange(max_attempts):
+        # Lector pulls in the browser automation stack on import so only load
+        # it once the library state is actually requested
+        from lector.reader import KindleCloudReaderAPI, KindleAPIError
+
+        for _ in range(max_attempts):
             try:
                 with KindleCloudReaderAPI\
                         .get_instance(self.uname, self.pword) as kcr:
-                    self.books = kcr.get_library_metadata()
-                    self.progress = kcr.get_library_progress()
+                    books = kcr.get_library_metadata()
+                    progress = kcr.get_library_progress()
             except KindleAPIError:
                 continue
             else:
-                break
+                return books, progress
+        return None
+
+    def _refresh_cache(self, max_attempts):
+        """Retrieves the Kindle Library and stores it in the cache
+        """
+        library = self._fetch_library(max_attempts)
+        if library is None:
+            _log.warning('Failed to refresh the cached Kindle library')
         else:
-            return None
+            self._cache.save(self.uname, *library)
+
+    def detect_events(self, max_attempts=3, force_refresh=False):
+        """Returns a list of `Event`s detected from differences in state
+        between the current snapshot and the Kindle Library.
+
+        `books` and `progress` attributes will be set with the latest API
+        results upon successful completion of the function.
+
+        If a cache was provided, cached state is used in place of the API
+        results and `cached_at` is set to the time it was retrieved. Stale
+        cached state is still used but is refreshed in the background for
+        subsequent calls. The refresh does not keep the process alive so
+        `wait_for_refresh` should be called before exiting for it to complete.
+
+        Args:
+            max_attempts: The number of times to attempt retrieval from the
+                KindleAPI before failing
+            force_refresh: If True, bypass the cache and retrieve the Kindle
+                Library from the KindleAPI
+
+        Returns:
+            If failed to retrieve progress, None
+            Else, the list of `Event`s
+        """
+        library = None
+        fetched = None
+        self.cached_at = None
+        if self._cache is not None and not force_refresh:
+            cached = self._cache.load(self.uname)
+            if cached is not None:
+                books, progress, fetched = cached
+                library = books, progress
+                self.cached_at = fetched
+                if datetime.now() - fetched > self._cache.max_age and \
+                        not self.refreshing:
+                    self._refresh = Thread(target=self._refresh_cache,
+                                           args=(max_attempts,))
+                    self._refresh.daemon = True
+                    self._refresh.start()
+        if library is None:
+            # Attempt to retrieve current state from KindleAPI
+            library = self._fetch_library(max_attempts)
+            if library is None:
+                return None
+            if self._cache is not None:
+                self._cache.save(self.uname, *library)
+        self.books, self.progress = library
 
         # Calculate diffs from new progress
         progress_map = {book.asin: self.progress[book.asin].locs[1]
                                                 for book in self.books}
         new_events = self._snapshot.calc_update_events(progress_map)
 
-        update_event = UpdateEvent(datetime.now().replace(microsecond=0))
+        # Stamp the update with the time the library state was retrieved
+        if fetched is None:
+            fetched = datetime.now()
+        update_event = UpdateEvent(fetched.replace(microsecond=0))
         new_events.append(update_event)
 
         self._event_buf.extend(new_events)
         return new_events
 
+    @property
+    def refreshing(self):
+        """Whether a background refresh of the cache is in progress
+        """
+        return self._refresh is not None and self._refresh.is_alive()
+
+    def wait_for_refresh(self):
+        """Blocks until any background refresh of the cache started by
+        `detect_events` completes
+        """
+        if self._refresh is not None:
+            self._refresh.join()
+            self._refresh = None
+
     def register_events(self, events=()):
         """Register `Event` objects in `events` to be committed.
 
@@ -85,7 +237,13 @@ class KindleProgressMgr(object):
         # future events' data in order to be parsed.
         # e.g. All ADDs must go before START READINGs
         #      All START READINGs before all READs
-        for event in sorted(self._event_buf):
-            self.store.record_event(event)
-            self._snapshot.process_event(event)
+        events = sorted(self._event_buf, key=_event_order)
+        self.store.record_events(events)
+        # Apply the events as read back from the store so that those recorded
+        # by others since the snapshot was last updated are applied as well
+        # and the checkpoint covers exactly the events applied
+        self._applied_offset = self._snapshot.apply_store_events(
+            self.store, self._applied_offset)
         self._event_buf = []
+        if self._checkpoint_path is not None:
+            self._snapshot.save(self._checkpoint_path, self._applied_offset)
@@ -2,12 +2,18 @@
 """
 from .events import AddEvent, SetReadingEvent, SetFinishedEvent, ReadEvent, \
                     KindleEvent
+from .fileutil import atomic_write
+
+from array import array
+import pickle
+
+import six
 
 
 class ReadingStatus(object):
     """An enum representing the three possible progress states of a book.
     """
-    NOT_STARTED, CURRENT, COMPLETED = xrange(3)
+    NOT_STARTED, CURRENT, COMPLETED = range(3)
 
 
 class BookSnapshot(object):
@@ -20,48 +26,168 @@ class BookSnapshot(object):
             This value is meaningless unless `status` is CURRENT as progress
             is untracked for books not currently being read.
     """
+    __slots__ = ('asin', 'status', 'progress')
+
     def __init__(self, asin, status=ReadingStatus.NOT_STARTED, progress=None):
         self.asin = asin
         self.status = status
         self.progress = progress
 
 
+# Stands in for a `progress` of None in the progress array. Progress is never
+# negative so this can't collide with a tracked value.
+_NO_PROGRESS = -1
+# A 64-bit signed integer array type: 'q' is unavailable on Python 2 where
+# 'l' is 64 bits wide on the platforms it is still used on
+_PROGRESS_TYPECODE = 'q' if six.PY3 else 'l'
+
+
 class KindleLibrarySnapshot(object):
     """A snapshot of the state of a Kindle library.
 
+    Book state is held column-wise: each book is assigned an index into
+    compact arrays of statuses and progress values rather than being held as
+    an object per book.
+
     Args:
         events: An iterable of ``KindleEvent``s which are applied in sequence
-            to build the snapshot's state.
+            to build the snapshot's state. They are not consumed until the
+            snapshot's state is first used.
     """
     def __init__(self, events=()):
-        self._data = {}
-        for event in events:
-            self.process_event(event)
+        self._asin_to_idx = {}
+        self._status = array('B')
+        self._progress = array(_PROGRESS_TYPECODE)
+        # Event classes are concrete so dispatch on the exact type
+        self._handlers = {
+            AddEvent: self._apply_add,
+            SetReadingEvent: self._apply_set_reading,
+            ReadEvent: self._apply_read,
+            SetFinishedEvent: self._apply_set_finished,
+        }
+        self._pending = events
+
+    def _apply_pending(self):
+        """Apply the events the snapshot was constructed with if they have not
+        yet been applied
+        """
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            for event in pending:
+                self._apply(event)
 
     def process_event(self, event):
         """Apply an event to the snapshot instance
         """
-        if not isinstance(event, KindleEvent):
-            pass
-        elif isinstance(event, AddEvent):
-            self._data[event.asin] = BookSnapshot(event.asin)
-        elif isinstance(event, SetReadingEvent):
-            self._data[event.asin].status = ReadingStatus.CURRENT
-            self._data[event.asin].progress = event.initial_progress
-        elif isinstance(event, ReadEvent):
-            self._data[event.asin].progress += event.progress
-        elif isinstance(event, SetFinishedEvent):
-            self._data[event.asin].status = ReadingStatus.COMPLETED
-        else:
+        self._apply_pending()
+        self._apply(event)
+
+    def _apply(self, event):
+        """Apply an event to the snapshot's state
+        """
+        handler = self._handlers.get(type(event))
+        if handler is not None:
+            handler(event)
+        elif isinstance(event, KindleEvent):
             raise TypeError
 
+    def _apply_add(self, event):
+        """Apply an `AddEvent` to the snapshot
+        """
+        idx = self._asin_to_idx.get(event.asin)
+        if idx is None:
+            self._asin_to_idx[event.asin] = len(self._status)
+            self._status.append(ReadingStatus.NOT_STARTED)
+            self._progress.append(_NO_PROGRESS)
+        else:
+            self._status[idx] = ReadingStatus.NOT_STARTED
+            self._progress[idx] = _NO_PROGRESS
+
+    def _apply_set_reading(self, event):
+        """Apply a `SetReadingEvent` to the snapshot
+        """
+        idx = self._asin_to_idx[event.asin]
+        self._status[idx] = ReadingStatus.CURRENT
+        self._progress[idx] = event.initial_progress
+
+    def _apply_read(self, event):
+        """Apply a `ReadEvent` to the snapshot
+
+        Raises:
+            TypeError: If no progress is tracked for the book
+        """
+        idx = self._asin_to_idx[event.asin]
+        if self._progress[idx] == _NO_PROGRESS:
+            raise TypeError('No progress is tracked for %s' % event.asin)
+        self._progress[idx] += event.progress
+
+    def _apply_set_finished(self, event):
+        """Apply a `SetFinishedEvent` to the snapshot
+        """
+        self._status[self._asin_to_idx[event.asin]] = ReadingStatus.COMPLETED
+
+    def apply_store_events(self, store, store_offset=0):
+        """Applies the events recorded in the `EventStore` `store` after the
+        byte offset `store_offset` as they are read from the store
+
+        Returns:
+            The store offset up to which the store's events have been applied
+        """
+        for store_offset, event in store.get_events_since(store_offset):
+            self.process_event(event)
+        return store_offset
+
+    @classmethod
+    def load(cls, file_path, store):
+        """Returns a tuple of `(snapshot, store_offset)` where `snapshot` is
+        restored from the checkpoint at `file_path` (as written by `save`) and
+        brought up to date with the events recorded in the `EventStore`
+        `store` since the checkpoint was taken, and `store_offset` is the
+        offset up to which the store's events have been applied to it.
+        """
+        with open(file_path, 'rb') as file_:
+            state, store_offset = pickle.load(file_)
+        snapshot = cls()
+        if store_offset > store.offset:
+            # The store was truncated or replaced after the checkpoint
+            return snapshot, snapshot.apply_store_events(store)
+        #pylint: disable=protected-access
+        snapshot._asin_to_idx, snapshot._status, progress = state
+        # Checkpoints from before progress was held as 64-bit values
+        snapshot._progress = array(_PROGRESS_TYPECODE, progress)
+        return snapshot, snapshot.apply_store_events(store, store_offset)
+
+    def save(self, file_path, store_offset):
+        """Writes a checkpoint of the snapshot's state to `file_path`
+
+        Args:
+            file_path: The path of the file to which to write the checkpoint
+            store_offset: The `EventStore` offset up to which the store's
+                events have been applied to the snapshot
+        """
+        self._apply_pending()
+        with atomic_write(file_path) as file_:
+            state = (self._asin_to_idx, self._status, self._progress)
+            pickle.dump((state, store_offset), file_, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def for_asin(cls, store, asin):
+        """Returns a snapshot of only the book `asin`, built from just that
+        book's events in the `EventStore` `store`
+        """
+        return cls(store.get_events_for_asin(asin))
+
     def get_book(self, asin):
-        """Return the `BookSnapshot` object associated with `asin`
+        """Return a `BookSnapshot` of the current state of the book `asin`
 
         Raises:
             KeyError: If asin not found in current snapshot
         """
-        return self._data[asin]
+        self._apply_pending()
+        idx = self._asin_to_idx[asin]
+        progress = self._progress[idx]
+        return BookSnapshot(asin, self._status[idx],
+                            None if progress == _NO_PROGRESS else progress)
 
     def calc_update_events(self, asin_to_progress):
         """Calculate and return an iterable of `KindleEvent`s which, when
@@ -79,15 +205,18 @@ class KindleLibrarySnapshot(object):
             A list of Event objects that account for the changes detected in
             the `asin_to_progress`.
         """
+        self._apply_pending()
         new_events = []
-        for asin, new_progress in asin_to_progress.iteritems():
-            try:
-                book_snapshot = self.get_book(asin)
-            except KeyError:
+        # Newly added books are the common miss so avoid raising KeyError
+        asin_to_idx = self._asin_to_idx
+        statuses, progresses = self._status, self._progress
+        current = ReadingStatus.CURRENT
+        for asin, new_progress in six.iteritems(asin_to_progress):
+            idx = asin_to_idx.get(asin)
+            if idx is None:
                 new_events.append(AddEvent(asin))
-            else:
-                if book_snapshot.status == ReadingStatus.CURRENT:
-                    change = new_progress - book_snapshot.progress
-                    if change > 0:
-                        new_events.append(ReadEvent(asin, change))
+            elif statuses[idx] == current:
+                change = new_progress - progresses[idx]
+                if change > 0:
+                    new_events.append(ReadEvent(asin, change))
         return new_events
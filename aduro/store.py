@@ -1,36 +1,238 @@
 """Defines tools for storing KindleEvents
 """
-from .events import AddEvent, SetReadingEvent, SetFinishedEvent, ReadEvent,\
-    EventParseError
+from .events import KindleEvent, match_event
+from .fileutil import atomic_write
+
+import os
+import re
+
+
+# Read the store in large chunks as it is consumed a line at a time
+_READ_BUFFER_SIZE = 1 << 20
+# Writes go straight to the file's descriptor. Under O_APPEND each write is
+# appended atomically so concurrent recorders never interleave partial lines.
+_WRITE_FLAGS = os.O_WRONLY | os.O_APPEND | os.O_CREAT | \
+        getattr(os, 'O_CLOEXEC', 0)
+# Each update of the index ends with a line holding no ASIN and the byte
+# offset in the store's file up to which its events are indexed
+_INDEXED_RE = re.compile(br'\t(\d+)\Z')
+# Enough of the end of the index to hold its last line when it is well-formed
+_INDEX_TAIL_SIZE = 64
+
+
+def _write_all(fd, data):
+    """Write all of the bytes `data` to the file descriptor `fd`
+    """
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _parse_line(line):
+    """Returns the ``KindleEvent`` held in the bytes `line` of the store's
+    file or None if it holds none
+    """
+    # Undecodable bytes can't form part of an event so a line holding them is
+    # skipped like any other that isn't an event
+    return match_event(line.decode('utf-8', 'replace').rstrip('\r\n'))
 
 
 class EventStore(object):
     """A simple newline-delimitted file store for events
+
+    Each call to record events appends them to the store's file with a single
+    write. The store holds its files open so it should be closed, or used as
+    a context manager, once no more events are to be recorded.
+
+    Alongside the store's file, an index file (`file_path` + '.idx') maps
+    each book's ASIN to the byte offsets of its events so that the events of
+    a single book can be read without scanning the whole store. The index
+    records how much of the store it covers so events appended by other
+    means are indexed when next needed.
     """
     def __init__(self, file_path):
         self._path = file_path
-        open(file_path, 'a').close()
+        self._index_path = file_path + '.idx'
+        self._fd = os.open(file_path, _WRITE_FLAGS, 0o644)
+        self._index_fd = None
+        try:
+            self._index_fd = os.open(self._index_path, _WRITE_FLAGS, 0o644)
+            self._update_index()
+        except:  #pylint: disable=bare-except
+            # Don't leak the descriptors opened so far
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _index_lines(self, offset):
+        """Returns a tuple of `(lines, end)` where `lines` is a list of the
+        index lines for the events in the store's file following the byte
+        offset `offset` and `end` is the offset up to which they were read
+        """
+        lines = []
+        for end, event in self._read_from(offset):
+            if event is not None:
+                lines.append('%s\t%d\n' % (event.asin, offset))
+            offset = end
+        return lines, offset
+
+    def _indexed_offset(self):
+        """Returns the byte offset in the store's file up to which events are
+        indexed or None if the index doesn't record one
+        """
+        with open(self._index_path, 'rb') as index_file:
+            index_file.seek(0, os.SEEK_END)
+            start = max(index_file.tell() - _INDEX_TAIL_SIZE, 0)
+            index_file.seek(start)
+            lines = index_file.read().split(b'\n')
+        # The last line must be complete, and so must the one preceding it
+        # unless it starts the file
+        if lines[-1] or len(lines) < (2 if start == 0 else 3):
+            return None
+        match = _INDEXED_RE.match(lines[-2])
+        return None if match is None else int(match.group(1))
+
+    def _build_index(self):
+        """Writes the index file for the events already in the store's file
+        """
+        lines, end = self._index_lines(0)
+        lines.append('\t%d\n' % end)
+        with atomic_write(self._index_path) as index_file:
+            index_file.write(''.join(lines).encode('utf-8'))
+
+    def _update_index(self):
+        """Brings the index up to date with the events in the store's file
+        """
+        indexed = self._indexed_offset()
+        if indexed is None or indexed > os.path.getsize(self._path):
+            # The index is missing, damaged, or describes a store that has
+            # since been truncated so replace it
+            self._build_index()
+            index_fd = os.open(self._index_path, _WRITE_FLAGS, 0o644)
+            os.close(self._index_fd)
+            self._index_fd = index_fd
+            return
+        lines, end = self._index_lines(indexed)
+        if end > indexed:
+            lines.append('\t%d\n' % end)
+            _write_all(self._index_fd, ''.join(lines).encode('utf-8'))
 
     def record_event(self, event):
         """Records the ``KindleEvent`` `event` in the store
         """
-        with open(self._path, 'a') as file_:
-            file_.write(str(event) + '\n')
+        self.record_events((event,))
+
+    def record_events(self, events):
+        """Records each ``KindleEvent`` in the iterable `events` in the store
+        """
+        lines = []
+        # Pairs of each event's ASIN and its offset within the written data
+        asin_offsets = []
+        size = 0
+        for event in events:
+            line = (str(event) + '\n').encode('utf-8')
+            if isinstance(event, KindleEvent):
+                asin_offsets.append((event.asin, size))
+            size += len(line)
+            lines.append(line)
+        if not lines:
+            return
+        _write_all(self._fd, b''.join(lines))
+        # The descriptor's position now follows the appended data wherever
+        # other writers placed it
+        end = os.lseek(self._fd, 0, os.SEEK_CUR)
+        start = end - size
+        if self._indexed_offset() != start:
+            # Events preceding these are not yet indexed so index everything
+            # from where the index left off, including these events
+            self._update_index()
+            return
+        index_lines = ['%s\t%d\n' % (asin, start + offset)
+                       for asin, offset in asin_offsets]
+        index_lines.append('\t%d\n' % end)
+        _write_all(self._index_fd, ''.join(index_lines).encode('utf-8'))
+
+    def close(self):
+        """Closes the store's files
+
+        Closing a store that is already closed has no effect.
+        """
+        # Forget each descriptor before closing it so it is never closed
+        # twice, possibly after its number has been reused
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+        index_fd, self._index_fd = self._index_fd, None
+        if index_fd is not None:
+            os.close(index_fd)
 
     def get_events(self):
-        """Returns a list of all ``KindleEvent``s held in the store
+        """Yields each ``KindleEvent`` held in the store in the order recorded
+
+        Events are parsed as the file is read so the full history is never
+        held in memory at once.
+        """
+        for _, event in self.get_events_since(0):
+            yield event
+
+    def get_events_for_asin(self, asin):
+        """Returns a list of the ``KindleEvent``s for the book `asin` held in
+        the store in the order recorded
+
+        Only the index and the events for `asin` are read from the store.
         """
-        with open(self._path, 'r') as file_:
-            file_lines = file_.read().splitlines()
-            event_lines = [line for line in file_lines if line]
+        self._update_index()
+        offsets = set()
+        with open(self._index_path, 'r') as index_file:
+            for line in index_file:
+                line_asin, _, offset = line.rstrip('\n').partition('\t')
+                if line_asin == asin:
+                    offsets.add(int(offset))
         events = []
-        for event_line in event_lines:
-            for event_cls in (AddEvent, SetReadingEvent, ReadEvent,
-                              SetFinishedEvent):
-                try:
-                    event = event_cls.from_str(event_line)
-                except EventParseError:
-                    pass
-                else:
+        with open(self._path, 'rb') as file_:
+            # Concurrent updates of the index may each index the same event
+            for offset in sorted(offsets):
+                file_.seek(offset)
+                event = _parse_line(file_.readline())
+                if event is not None:
                     events.append(event)
         return events
+
+    @property
+    def offset(self):
+        """The byte offset in the store's file following the last recorded
+        event
+        """
+        return os.fstat(self._fd).st_size
+
+    def get_events_since(self, offset):
+        """Yields a tuple of `(end, event)` for each ``KindleEvent`` recorded
+        in the store after the byte offset `offset` in the order recorded,
+        where `end` is the offset following the event from which to read any
+        later events
+
+        Events are parsed as the file is read so they are never held in memory
+        at once.
+        """
+        for end, event in self._read_from(offset):
+            if event is not None:
+                yield end, event
+
+    def _read_from(self, offset):
+        """Yields a tuple of `(end, event)` for each complete line of the
+        store's file following the byte offset `offset`, where `end` is the
+        offset following the line and `event` is the ``KindleEvent`` it holds
+        (or None if it holds none)
+        """
+        with open(self._path, 'rb', _READ_BUFFER_SIZE) as file_:
+            file_.seek(offset)
+            for line in file_:
+                if not line.endswith(b'\n'):
+                    # Leave a partially written event to be read once complete
+                    break
+                offset += len(line)
+                yield offset, _parse_line(line)
@@ -1,56 +1,80 @@
 #!/usr/bin/env python
 """Define a command line interface for Kindle Progress tracking
 """
+from __future__ import print_function
+
 from aduro.events import SetReadingEvent, SetFinishedEvent
 from aduro.store import EventStore
-from aduro.manager import KindleProgressMgr
+from aduro.manager import KindleProgressMgr, LibraryCache
 
+import argparse
 import json
+import logging
+
+from six.moves import input
 
 
 STORE_PATH = '.store.txt'
 CREDENTIAL_PATH = '.credentials.json'
+CACHE_PATH = '.library_cache.pkl'
+CHECKPOINT_PATH = '.snapshot.pkl'
 
 
 def safe_raw_input(*args, **kwargs):
     """A `raw_input` wrapper with graceful handling of KeyboardInterrupt.
 
-    A wrapper around the normal `raw_input` builtin that, when a
-    `KeyboardInterrupt` is raised, the exception is caught and None is
-    returned.
+    A wrapper around the normal `raw_input` builtin (`input` on Python 3)
+    that, when a `KeyboardInterrupt` is raised, the exception is caught and
+    None is returned.
     """
     try:
-        return raw_input(*args, **kwargs)
+        return input(*args, **kwargs)
     except KeyboardInterrupt:
         return None
 
 
-def run():  #pylint: disable=too-many-locals
+def run(args):  #pylint: disable=too-many-locals
     """Execute the command loop
+
+    Args:
+        args: The parsed command line arguments. `command` selects whether to
+            only record detected updates ('sync') or to then prompt for
+            changes in reading state ('interactive'). `force_refresh`
+            retrieves the Kindle Library even if a fresh copy is cached.
     """
-    store = EventStore(STORE_PATH)
     with open(CREDENTIAL_PATH, 'r') as cred_file:
         creds = json.load(cred_file)
         uname, pword = creds['uname'], creds['pword']
-    mgr = KindleProgressMgr(store, uname, pword)
-
-    print 'Detecting updates to Kindle progress:'
-    events = mgr.detect_events()
-    if events is None:
-        print 'Failed to retrieve Kindle progress updates'
-        return
-    elif not events:
-        print '  No updates detected'
-    else:
-        for event in events:
-            print '  ' + str(event)
-
-    print
-    print 'Finished updating.'
-    print 'Mark new books as \'reading\' or old books as \'read\'? (y/N)'
-    if safe_raw_input('> ') == 'y':
-        _change_state_prompt(mgr)
-    mgr.commit_events()
+    with EventStore(STORE_PATH) as store:
+        mgr = KindleProgressMgr(store, uname, pword,
+                                cache=LibraryCache(CACHE_PATH),
+                                checkpoint_path=CHECKPOINT_PATH)
+
+        print('Detecting updates to Kindle progress:')
+        events = mgr.detect_events(force_refresh=args.force_refresh)
+        if events is None:
+            print('Failed to retrieve Kindle progress updates')
+            return
+        if mgr.cached_at is not None:
+            print('  Using the Kindle library cached at %s' %
+                  mgr.cached_at.strftime('%Y-%m-%d %H:%M'))
+        if not events:
+            print('  No updates detected')
+        else:
+            for event in events:
+                print('  ' + str(event))
+
+        if args.command == 'interactive':
+            print()
+            print('Finished updating.')
+            print('Mark new books as \'reading\' or old books as \'read\'? '
+                  '(y/N)')
+            if safe_raw_input('> ') == 'y':
+                _change_state_prompt(mgr)
+        mgr.commit_events()
+        if mgr.refreshing:
+            print('Waiting for the cached Kindle library to refresh...')
+        mgr.wait_for_refresh()
 
 
 def _change_state_prompt(mgr):
@@ -63,36 +87,66 @@ def _change_state_prompt(mgr):
             fields populated.
     """
     cmd = ''
-    book_range = range(1, len(mgr.books) + 1)
-    ind_to_book = dict(zip(book_range, mgr.books))
-    get_book = lambda cmd_str: ind_to_book[int(cmd_str.split()[1])]
+    books = mgr.books
+    # Registering events doesn't change the listing so only format it once
+    books_block = '\n'.join('\t%d: %s' % (i, book)
+                            for i, book in enumerate(books, 1))
+
+    def get_book(cmd_str):
+        """Return the book indexed by the argument of the command `cmd_str`
+        """
+        index = int(cmd_str.split()[1])
+        if index < 1:
+            raise IndexError('Book indices start at 1')
+        return books[index - 1]
+
     while cmd != 'q':
-        print 'Books:'
-        for i in book_range:
-            print '\t%d: %s' % (i, ind_to_book[i])
-        print 'Commands:'
-        print '| start {#}   | Start reading book with index {#}'
-        print '| finish {#}  | Finish reading book with index {#}'
-        print '| q           | Quit'
+        print('Books:')
+        print(books_block)
+        print('Commands:')
+        print('| start {#}   | Start reading book with index {#}')
+        print('| finish {#}  | Finish reading book with index {#}')
+        print('| q           | Quit')
         cmd = safe_raw_input('> ')
         if cmd is None or cmd == 'q':
             break
-        elif cmd.startswith('start '):
-            book = get_book(cmd)
-            initial_progress = mgr.progress[book.asin].locs[1]
-            event = SetReadingEvent(book.asin, initial_progress)
-        elif cmd.startswith('finish '):
-            event = SetFinishedEvent(get_book(cmd).asin)
+        event = None
+        try:
+            if cmd.startswith('start '):
+                book = get_book(cmd)
+                initial_progress = mgr.progress[book.asin].locs[1]
+                event = SetReadingEvent(book.asin, initial_progress)
+            elif cmd.startswith('finish '):
+                event = SetFinishedEvent(get_book(cmd).asin)
+        except (ValueError, IndexError):
+            # A malformed book index or one outside the listing
+            pass
+        if event is None:
+            print('Invalid command')
         else:
-            print 'Invalid command'
-            event = None
-        if event is not None:
-            print
-            print 'REGISTERED EVENT:'
-            print '  ' + str(event)
-            mgr.register_events((event))
-        print
+            print()
+            print('REGISTERED EVENT:')
+            print('  ' + str(event))
+            mgr.register_events((event,))
+        print()
+
+
+def _parse_args(argv=None):
+    """Parse the command line arguments in `argv` (default: `sys.argv`)
+    """
+    parser = argparse.ArgumentParser(
+        description='Track reading progress of an Amazon Kindle library')
+    parser.add_argument('command', nargs='?', default='interactive',
+                        choices=('sync', 'interactive'),
+                        help='\'sync\' only records detected updates while '
+                             '\'interactive\' then prompts to mark books as '
+                             'reading or read (default: interactive)')
+    parser.add_argument('--force-refresh', action='store_true',
+                        help='retrieve the Kindle library even if a fresh '
+                             'copy is cached')
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    run()
+    logging.basicConfig(format='%(message)s')
+    run(_parse_args())
@@ -0,0 +1,49 @@
+"""Tests for the parsing of serialized events
+"""
+from aduro.events import AddEvent, EventParseError, ReadEvent, \
+        SetFinishedEvent, SetReadingEvent, match_event, parse_event
+
+import unittest
+
+
+_SERIALIZED = [
+    (AddEvent, 'ADD A'),
+    (SetReadingEvent, 'START READING A FROM LOCATION 5'),
+    (ReadEvent, 'READ A FOR 3 LOCATIONS'),
+    (SetFinishedEvent, 'FINISH READING A'),
+]
+
+_MALFORMED = [
+    'ADD',
+    'ADD A ',
+    'ADD A B',
+    'READ A FOR 0 LOCATIONS',
+    u'READ A FOR \u00b2 LOCATIONS',
+    'START READING A FROM LOCATION x',
+    'UPDATE 2016-01-01T00:00:00',
+]
+
+
+class ParseEventTest(unittest.TestCase):
+    def test_round_trip(self):
+        for event_cls, string in _SERIALIZED:
+            event = parse_event(string)
+            self.assertIs(type(event), event_cls)
+            self.assertEqual(str(event), string)
+            self.assertEqual(str(event_cls.from_str(string)), string)
+
+    def test_from_str_of_other_event(self):
+        for event_cls, _ in _SERIALIZED:
+            for other_cls, string in _SERIALIZED:
+                if other_cls is not event_cls:
+                    self.assertRaises(EventParseError, event_cls.from_str,
+                                      string)
+
+    def test_malformed(self):
+        for string in _MALFORMED:
+            self.assertIsNone(match_event(string))
+            self.assertRaises(EventParseError, parse_event, string)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Tests for building `KindleLibrarySnapshot`s from events
+"""
+from aduro.events import AddEvent, ReadEvent, SetFinishedEvent, \
+        SetReadingEvent
+from aduro.snapshot import KindleLibrarySnapshot, ReadingStatus
+from aduro.store import EventStore
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class KindleLibrarySnapshotTest(unittest.TestCase):
+    def test_progress(self):
+        snapshot = KindleLibrarySnapshot([
+            AddEvent('A'), AddEvent('B'), SetReadingEvent('A', 5),
+            ReadEvent('A', 3), SetFinishedEvent('A')])
+        book = snapshot.get_book('A')
+        self.assertEqual(book.status, ReadingStatus.COMPLETED)
+        self.assertEqual(book.progress, 8)
+        book = snapshot.get_book('B')
+        self.assertEqual(book.status, ReadingStatus.NOT_STARTED)
+        self.assertIsNone(book.progress)
+
+    def test_large_progress(self):
+        snapshot = KindleLibrarySnapshot([
+            AddEvent('A'), SetReadingEvent('A', 3000000000),
+            ReadEvent('A', 3000000000)])
+        self.assertEqual(snapshot.get_book('A').progress, 6000000000)
+
+    def test_read_without_progress(self):
+        snapshot = KindleLibrarySnapshot([AddEvent('A'), ReadEvent('A', 5)])
+        self.assertRaises(TypeError, snapshot.get_book, 'A')
+
+    def test_negative_initial_progress(self):
+        self.assertRaises(ValueError, SetReadingEvent, 'A', -1)
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.dir, 'store.txt')
+        self.checkpoint_path = os.path.join(self.dir, 'snapshot.pkl')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_replays_later_events(self):
+        with EventStore(self.store_path) as store:
+            store.record_events([AddEvent('A'), SetReadingEvent('A', 5)])
+            snapshot = KindleLibrarySnapshot()
+            offset = snapshot.apply_store_events(store)
+            snapshot.save(self.checkpoint_path, offset)
+            with EventStore(self.store_path) as other_store:
+                other_store.record_events([AddEvent('B'), ReadEvent('A', 3)])
+            snapshot, offset = KindleLibrarySnapshot.load(
+                self.checkpoint_path, store)
+            self.assertEqual(offset, store.offset)
+            self.assertEqual(snapshot.get_book('A').progress, 8)
+            self.assertEqual(snapshot.get_book('B').status,
+                             ReadingStatus.NOT_STARTED)
+
+    def test_load_after_truncation(self):
+        with EventStore(self.store_path) as store:
+            store.record_events([AddEvent('A'), AddEvent('B')])
+            snapshot = KindleLibrarySnapshot()
+            snapshot.save(self.checkpoint_path,
+                          snapshot.apply_store_events(store))
+        with open(self.store_path, 'w') as file_:
+            file_.write('ADD C\n')
+        with EventStore(self.store_path) as store:
+            snapshot, _ = KindleLibrarySnapshot.load(self.checkpoint_path,
+                                                     store)
+            self.assertRaises(KeyError, snapshot.get_book, 'A')
+            self.assertEqual(snapshot.get_book('C').asin, 'C')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Tests for the recovery of the `EventStore` ASIN index
+"""
+from aduro.events import AddEvent, ReadEvent, SetReadingEvent
+from aduro.store import EventStore
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class EventStoreIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'store.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data, mode='wb'):
+        with open(self.path, mode) as file_:
+            file_.write(data)
+
+    def events_for_asin(self, store, asin):
+        return [str(event) for event in store.get_events_for_asin(asin)]
+
+    def test_recorded_events(self):
+        with EventStore(self.path) as store:
+            store.record_events([AddEvent('A'), AddEvent('B'),
+                                 SetReadingEvent('A', 5)])
+            store.record_event(ReadEvent('A', 3))
+            self.assertEqual(self.events_for_asin(store, 'A'),
+                             ['ADD A', 'START READING A FROM LOCATION 5',
+                              'READ A FOR 3 LOCATIONS'])
+            self.assertEqual(self.events_for_asin(store, 'B'), ['ADD B'])
+
+    def test_missing_index(self):
+        self.write(b'ADD A\nADD B\nREAD A FOR 2 LOCATIONS\n')
+        with EventStore(self.path) as store:
+            self.assertEqual(self.events_for_asin(store, 'A'),
+                             ['ADD A', 'READ A FOR 2 LOCATIONS'])
+
+    def test_index_without_indexed_offset(self):
+        self.write(b'ADD A\nADD B\n')
+        with open(self.path + '.idx', 'w') as index_file:
+            index_file.write('A\t0\n')
+        with EventStore(self.path) as store:
+            self.assertEqual(self.events_for_asin(store, 'B'), ['ADD B'])
+
+    def test_external_append(self):
+        with EventStore(self.path) as store:
+            store.record_event(AddEvent('A'))
+            self.write(b'START READING A FROM LOCATION 5\n', 'ab')
+            self.assertEqual(self.events_for_asin(store, 'A'),
+                             ['ADD A', 'START READING A FROM LOCATION 5'])
+            store.record_event(ReadEvent('A', 3))
+            self.assertEqual(self.events_for_asin(store, 'A'),
+                             ['ADD A', 'START READING A FROM LOCATION 5',
+                              'READ A FOR 3 LOCATIONS'])
+
+    def test_partial_line(self):
+        with EventStore(self.path) as store:
+            self.write(b'ADD A\nADD B', 'ab')
+            self.assertEqual(self.events_for_asin(store, 'B'), [])
+            self.write(b'\n', 'ab')
+            self.assertEqual(self.events_for_asin(store, 'B'), ['ADD B'])
+
+    def test_truncated_store(self):
+        with EventStore(self.path) as store:
+            store.record_events([AddEvent('A'), AddEvent('B')])
+        self.write(b'ADD C\n')
+        with EventStore(self.path) as store:
+            self.assertEqual(self.events_for_asin(store, 'A'), [])
+            self.assertEqual(self.events_for_asin(store, 'C'), ['ADD C'])
+
+    def test_duplicate_index_entries(self):
+        with EventStore(self.path) as store:
+            store.record_event(AddEvent('A'))
+            with open(self.path + '.idx', 'a') as index_file:
+                index_file.write('A\t0\n\t6\n')
+            self.assertEqual(self.events_for_asin(store, 'A'), ['ADD A'])
+
+    def test_concurrent_stores(self):
+        with EventStore(self.path) as store, \
+                EventStore(self.path) as other_store:
+            store.record_event(AddEvent('A'))
+            other_store.record_event(SetReadingEvent('A', 5))
+            store.record_event(ReadEvent('A', 3))
+            self.assertEqual(self.events_for_asin(other_store, 'A'),
+                             ['ADD A', 'START READING A FROM LOCATION 5',
+                              'READ A FOR 3 LOCATIONS'])
+
+    def test_undecodable_line(self):
+        self.write(b'ADD A\nADD \xff\nADD B\n')
+        with EventStore(self.path) as store:
+            self.assertEqual([str(event) for event in store.get_events()],
+                             ['ADD A', 'ADD B'])
+            self.assertEqual(self.events_for_asin(store, 'B'), ['ADD B'])
+
+    def test_close_twice(self):
+        with EventStore(self.path) as store:
+            store.close()
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()